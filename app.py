@@ -1,10 +1,17 @@
 from flask import Flask, render_template, request, send_file, session, jsonify
 import os
+import re
 import zipfile
 import shutil
 import json
+import hashlib
+import uuid
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from services.summary import build_summary
+from services.dashboard import query_dashboard, save_buckets, load_buckets
+from services.coalesce import run_once, running_keys
 import services.loaders as loaders
 import os
 
@@ -17,6 +24,26 @@ app.secret_key = "super-secret-key-for-alarms-filter"
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Dashboard buckets of the most recent jobs (LRU) in front of the
+# dashboard.json stored in each job folder, served by /dashboard_stats
+DASHBOARD_CACHE_SIZE = 8
+_dashboard_cache = OrderedDict()
+_dashboard_cache_lock = threading.Lock()
+
+def _cache_dashboard(job_id, dashboard_buckets):
+    with _dashboard_cache_lock:
+        _dashboard_cache[job_id] = dashboard_buckets
+        _dashboard_cache.move_to_end(job_id)
+        while len(_dashboard_cache) > DASHBOARD_CACHE_SIZE:
+            _dashboard_cache.popitem(last=False)
+
+def _cached_dashboard(job_id):
+    with _dashboard_cache_lock:
+        dashboard_buckets = _dashboard_cache.get(job_id)
+        if dashboard_buckets is not None:
+            _dashboard_cache.move_to_end(job_id)
+        return dashboard_buckets
+
 # =========================
 # Index (GET فقط)
 # =========================
@@ -29,6 +56,97 @@ def index():
         oz_list=loaders.oz_list
     )
 
+# =========================
+# Save + Build (shared by identical concurrent uploads)
+# =========================
+JOBS_FOLDER = os.path.join(UPLOAD_FOLDER, "jobs")
+JOBS_TO_KEEP = 20
+JOB_ID_REGEX = re.compile(r"[0-9a-f]{64}")
+DASHBOARD_FILE = "dashboard.json"
+
+class UploadError(ValueError):
+    """The uploaded file can't be processed (reported to the user as 400)."""
+
+def _job_id(data, selected_oz):
+    return hashlib.sha256(data + b"\0" + selected_oz.encode("utf-8")).hexdigest()
+
+# Serializes pruning with jobs claiming their folder, so a folder is never
+# deleted between a job starting and marking it as recently used
+_jobs_lock = threading.Lock()
+
+def _use_job_dir(job_id):
+    job_dir = os.path.join(JOBS_FOLDER, job_id)
+    with _jobs_lock:
+        os.makedirs(job_dir, exist_ok=True)
+        os.utime(job_dir)
+    return job_dir
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+def _prune_jobs():
+    # Keep only the most recently used job folders, never one that is still running
+    with _jobs_lock:
+        running = running_keys()
+        jobs = []
+        for job_dir in Path(JOBS_FOLDER).iterdir():
+            mtime = _mtime(job_dir)
+            if mtime is not None:
+                jobs.append((mtime, job_dir))
+        jobs.sort(key=lambda j: j[0], reverse=True)
+        for _, old in jobs[JOBS_TO_KEEP:]:
+            if old.name not in running:
+                shutil.rmtree(old, ignore_errors=True)
+
+def _prune_jobs_quietly():
+    # Housekeeping must never fail a request whose summary is already built
+    try:
+        _prune_jobs()
+    except Exception as e:
+        print(f"⚠️ Pruning jobs failed: {e}")
+
+def _save_and_build(job_id, filename, data, selected_oz):
+    # Every job (content + OZ) gets its own folder, so different jobs never
+    # share an upload, an extract dir or a Summary.xlsx
+    job_dir = _use_job_dir(job_id)
+
+    path = os.path.join(job_dir, os.path.basename(filename))
+    if not os.path.exists(path):
+        tmp_path = path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    # Process the file
+    if filename.lower().endswith(".zip"):
+        extract_dir = os.path.join(job_dir, "extracted")
+        try:
+            if not os.path.exists(extract_dir):
+                tmp_dir = extract_dir + ".part"
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                with zipfile.ZipFile(path, 'r') as zip_ref:
+                    zip_ref.extractall(tmp_dir)
+                os.replace(tmp_dir, extract_dir)
+        except Exception as e:
+            raise UploadError(f"Error extracting ZIP: {e}")
+
+        # Find the first .xlsx or .xlsm file
+        xlsx_files = list(Path(extract_dir).rglob("*.xls*"))
+        if not xlsx_files:
+            raise UploadError("No Excel file (.xlsx or .xlsm) found in the ZIP archive")
+
+        path = str(xlsx_files[0])
+    elif not filename.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        raise UploadError(f"Unsupported file format: {filename}. Please upload .xlsx or .zip")
+
+    # Build summary (بنفس المنطق)
+    summary = build_summary(path, selected_oz, excel_path=os.path.join(job_dir, "Summary.xlsx"))
+    save_buckets(os.path.join(job_dir, DASHBOARD_FILE), summary[-1])
+    return path, summary
+
 # =========================
 # Process (POST)
 # =========================
@@ -44,39 +162,24 @@ def process():
         return "Please select OZ", 400
 
     filename = file.filename
-    path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(path)
+    data = file.read()
 
-    # Process the file
-    if filename.lower().endswith(".zip"):
-        try:
-            extract_dir = os.path.join(UPLOAD_FOLDER, "extracted_" + Path(filename).stem)
-            if os.path.exists(extract_dir):
-                shutil.rmtree(extract_dir)
-            os.makedirs(extract_dir, exist_ok=True)
-            
-            with zipfile.ZipFile(path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-                
-            # Find the first .xlsx or .xlsm file
-            xlsx_files = list(Path(extract_dir).rglob("*.xls*"))
-            if not xlsx_files:
-                return "No Excel file (.xlsx or .xlsm) found in the ZIP archive", 400
-            
-            path = str(xlsx_files[0]) 
-        except Exception as e:
-            return f"Error extracting ZIP: {e}", 400
-    elif not filename.lower().endswith((".xlsx", ".xlsm", ".xls")):
-        return f"Unsupported file format: {filename}. Please upload .xlsx or .zip", 400
+    # Identical uploads (same content + OZ) running concurrently share one build
+    job_id = _job_id(data, selected_oz)
+    try:
+        path, summary = run_once(job_id, _save_and_build, job_id, filename, data, selected_oz)
+    except UploadError as e:
+        return str(e), 400
+    _prune_jobs_quietly()
+
+    df, dashboard, dashboard_summary, tables_down_env, critical_env_table, tables_env_only, \
+    tech_labels, tech_counts, down_type_counts, env_labels, env_values, excel_path, dashboard_buckets = summary
+    _cache_dashboard(job_id, dashboard_buckets)
 
     # Save to session for export
     session["last_processed_path"] = path
     session["last_selected_oz"] = selected_oz
-
-    # Build summary (بنفس المنطق)
-    df, dashboard, dashboard_summary, tables_down_env, critical_env_table, tables_env_only, \
-    tech_labels, tech_counts, down_type_counts, env_labels, env_values, excel_path = \
-        build_summary(path, selected_oz)
+    session["last_job_id"] = job_id
 
     return render_template(
         "result.html",
@@ -90,7 +193,8 @@ def process():
         env_labels=env_labels,
         env_values=env_values,
         critical_env_table=critical_env_table,
-        excel_path=excel_path
+        excel_path=excel_path,
+        job_id=job_id
     )
 
 # =========================
@@ -109,19 +213,50 @@ def export_excel():
         
         path = session.get("last_processed_path")
         selected_oz = session.get("last_selected_oz")
+        job_id = session.get("last_job_id")
         
-        if not path or not os.path.exists(path):
+        if not path or not job_id or not os.path.exists(path):
             return jsonify({"error": "No session data found. Please upload file again."}), 400
+
+        # One export file per user and job, so concurrent exports don't overwrite each other
+        export_id = session.setdefault("export_id", uuid.uuid4().hex)
+        export_path = os.path.join(_use_job_dir(job_id), f"Export_{export_id}.xlsx")
             
         # Re-build summary with comments and dates
         df, dashboard, dashboard_summary, tables_down_env, critical_env_table, tables_env_only, \
-        tech_labels, tech_counts, down_type_counts, env_labels, env_values, excel_path = \
-            build_summary(path, selected_oz, user_comments=user_comments, start_date=start_date, end_date=end_date)
+        tech_labels, tech_counts, down_type_counts, env_labels, env_values, excel_path, dashboard_buckets = \
+            build_summary(path, selected_oz, user_comments=user_comments, start_date=start_date, end_date=end_date, excel_path=export_path)
             
         return jsonify({"download_url": f"/download?file={excel_path}"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# =========================
+# Dashboard Stats (filtered)
+# =========================
+@app.route("/dashboard_stats", methods=["GET"])
+def dashboard_stats():
+    # The page sends its own job id, so each result tab keeps its own counters
+    job_id = request.args.get("job", "")
+    if not JOB_ID_REGEX.fullmatch(job_id):
+        return jsonify({"error": "Invalid job. Please upload file again."}), 400
+
+    dashboard_buckets = _cached_dashboard(job_id)
+    if dashboard_buckets is None:
+        buckets_path = os.path.join(JOBS_FOLDER, job_id, DASHBOARD_FILE)
+        if not os.path.exists(buckets_path):
+            return jsonify({"error": "Dashboard data expired. Please upload file again."}), 404
+        dashboard_buckets = load_buckets(buckets_path)
+        _cache_dashboard(job_id, dashboard_buckets)
+
+    dashboard, dashboard_summary = query_dashboard(
+        dashboard_buckets,
+        offices=request.args.getlist("office"),
+        start_date=request.args.get("start_date"),
+        end_date=request.args.get("end_date")
+    )
+    return jsonify({"dashboard": dashboard, "dashboard_summary": dashboard_summary})
+
 @app.route("/download")
 def download():
     file_path = request.args.get("file")
@@ -0,0 +1,47 @@
+import copy
+import threading
+
+# ===== Single-flight =====
+# Identical jobs that arrive while one is already running wait for it and
+# share its result (or its exception) instead of recomputing.
+
+_lock = threading.Lock()
+_inflight = {}
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def run_once(key, fn, *args, **kwargs):
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            # Raise a copy: the leader's exception object (and its traceback)
+            # stays owned by the leader's thread
+            raise copy.copy(call.error) from call.error
+        return call.result
+
+    try:
+        call.result = fn(*args, **kwargs)
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        call.done.set()
+    return call.result
+
+def running_keys():
+    with _lock:
+        return set(_inflight)
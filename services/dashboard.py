@@ -0,0 +1,98 @@
+import json
+import os
+import pandas as pd
+
+TECH_LABELS = ["2G", "3G", "4G", "5G"]
+
+# ===== Dashboard Buckets =====
+# Counters are accumulated while build_summary assembles the rows, keyed by
+# (SC Office, day). The day is the date the web tables filter that row on:
+# "Alarm Time" for down sites, "ENV Alarm Time" for ENV-only sites and
+# critical ENV entries. Filtering the dashboard is then a sum over buckets.
+
+def new_bucket():
+    return {
+        "Total Down": 0,
+        "Partial Down": 0,
+        "ENV": 0,
+        "Critical ENV": 0,
+        "Techs": dict.fromkeys(TECH_LABELS, 0)
+    }
+
+def _day(time_str):
+    return time_str[:10] if time_str else ""
+
+def _bucket(buckets, office, day):
+    key = (office, day)
+    if key not in buckets:
+        buckets[key] = new_bucket()
+    return buckets[key]
+
+def count_site(buckets, row, techs_down, env_count, critical_count):
+    # Sites without an SC Office only count towards the totals
+    office = row["SC Office"]
+    if pd.isna(office) or not str(office).strip():
+        office = None
+
+    if row["Down Alarm"]:
+        b = _bucket(buckets, office, _day(row["Alarm Time"]))
+        if row["Down Type"] == "Total": b["Total Down"] += 1
+        elif row["Down Type"] == "Partial": b["Partial Down"] += 1
+        b["ENV"] += env_count
+        for tech in {t.split(" ")[0] for t in techs_down}:
+            if tech in b["Techs"]:
+                b["Techs"][tech] += 1
+    elif row["ENV Alarms"]:
+        b = _bucket(buckets, office, _day(row["ENV Alarm Time"]))
+        b["ENV"] += env_count
+
+    if critical_count:
+        _bucket(buckets, office, _day(row["ENV Alarm Time"]))["Critical ENV"] += 1
+
+# ===== Query =====
+def _in_range(day, start_date, end_date):
+    if not start_date and not end_date:
+        return True
+    # Rows with no time are hidden as soon as a date filter is active
+    if not day:
+        return False
+    return not ((start_date and day < start_date) or (end_date and day > end_date))
+
+def query_dashboard(buckets, offices=None, start_date=None, end_date=None):
+    dashboard = {}
+    total = new_bucket()
+    for (office, day), b in buckets.items():
+        if offices and office not in offices:
+            continue
+        if not _in_range(day, start_date, end_date):
+            continue
+        targets = [total]
+        if office is not None:
+            targets.append(dashboard.setdefault(office, new_bucket()))
+        for t in targets:
+            for k in ("Total Down", "Partial Down", "ENV", "Critical ENV"):
+                t[k] += b[k]
+            for tech, n in b["Techs"].items():
+                t["Techs"][tech] += n
+
+    dashboard = {office: dashboard[office] for office in sorted(dashboard, key=str)}
+    dashboard_summary = {
+        "Total Down Sites": total["Total Down"],
+        "Total Partial Sites": total["Partial Down"],
+        "Total Env Alarms": total["ENV"],
+        "Total Critical ENV": total["Critical ENV"],
+        "Techs Down": total["Techs"]
+    }
+    return dashboard, dashboard_summary
+
+# ===== Persistence =====
+# Buckets are stored next to the job's files so they live as long as the job
+def save_buckets(path, buckets):
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([[office, day, b] for (office, day), b in buckets.items()], f, default=str)
+    os.replace(tmp_path, path)
+
+def load_buckets(path):
+    with open(path, encoding="utf-8") as f:
+        return {(office, day): b for office, day, b in json.load(f)}
@@ -1,37 +1,59 @@
+import sys
 import pandas as pd
 from services.loaders import clean_text, valid_sites, down_alarm_names, alarm_category_dict, hw_rename_dict, TECH_MAP, extract_site_code
 
-def build_down_description_per_tech(row, alarm_category, current_tech):
-    desc_per_tech = {}
+# ===== Compact per-site down state =====
+# dicts are used as insertion-ordered sets so membership checks stay O(1)
+class SiteDownState:
+    __slots__ = ("techs", "om_only", "cells_only", "partial_only", "cell_counts", "seen_cell_counts", "hw_alarms", "times")
+
+    def __init__(self):
+        self.techs = {}
+        self.om_only = {}
+        self.cells_only = {}
+        self.partial_only = {}
+        self.cell_counts = {}
+        self.seen_cell_counts = set()
+        self.hw_alarms = {}
+        self.times = []
+
+    def add_cell_counts(self, cells_map):
+        # A count only replaces the shown one the first time it is reported for that tech
+        for tech, count in cells_map.items():
+            if (tech, count) not in self.seen_cell_counts:
+                self.seen_cell_counts.add((tech, count))
+                self.cell_counts[tech] = count
+
+    def down_techs(self):
+        return list(self.techs) + [f"{t} Cells" for t in self.cells_only]
+
+
+def parse_cells_and_hw(row, alarm_category):
+    """Parse a down alarm row into ({tech: faulty cells count}, ordered set of HW alarm lines)."""
+    cells_map = {}
+    hw_items = {}
 
     if alarm_category == "O&M":
-        return desc_per_tech
+        return cells_map, hw_items
 
     user_info = str(row.get("User Additional Information", "")).strip()
     diag_info = str(row.get("Diagnostic Info", "")).strip()
     supp_info = str(row.get("Supplementary Information", "")).strip()
 
     # ===== Cells =====
-    cells_map = {}
     if "faulty_cells=" in user_info.lower():
         try:
             data = user_info.lower().split("faulty_cells=")[1].split(";")
             for item in data:
                 if ":" in item:
                     tech_name, cells = item.split(":")
-                    tech_name = tech_name.strip().upper()
+                    tech_name = sys.intern(tech_name.strip().upper())
                     count = len([c for c in cells.split(",") if c.strip()])
                     cells_map[tech_name] = cells_map.get(tech_name, 0) + count
         except:
             pass
 
-    for tech, count in cells_map.items():
-        desc_per_tech.setdefault(tech, [])
-        # Only store the count, we'll prefix tech in summary.py
-        desc_per_tech[tech].append(f"CELLS_COUNT:{count}")
-
     # ===== HW Alarm (Lookup via Supplementary Information) =====
-    hw_items = set()
     # The 'alarm name' comes from the Output column in HW-Rename.xlsx
     # We use supp_info as the key.
     alarm_name_from_dict = hw_rename_dict.get(supp_info.upper(), supp_info)
@@ -50,20 +72,11 @@ def build_down_description_per_tech(row, alarm_category, current_tech):
     if not hw_units and supp_info:
         hw_units.append(supp_info)
 
-    # Build the formatted HW Alarm lines
+    # Build the formatted HW Alarm lines (interned, the same lines repeat across sites)
     for unit in hw_units:
-        hw_items.add(f"HW Alarm: {alarm_name_from_dict} ({unit})")
-
-    # Add HW items to affected techs
-    target_techs = list(cells_map.keys())
-    if not target_techs:
-        target_techs = [current_tech]
+        hw_items[sys.intern(f"HW Alarm: {alarm_name_from_dict} ({unit})")] = None
 
-    for tech in target_techs:
-        for hw in hw_items:
-            desc_per_tech.setdefault(tech, []).append(hw)
-
-    return desc_per_tech
+    return cells_map, hw_items
 
 
 def build_down_dict(filepath):
@@ -80,59 +93,37 @@ def build_down_dict(filepath):
                 if not site_code or site_code not in valid_sites:
                     continue
 
-                if site_code not in down_info:
-                    down_info[site_code] = {
-                        "techs": set(),
-                        "cells_only": set(),
-                        "om_only": set(),
-                        "partial_only": set(),
-                        "descriptions": [],
-                        "descriptions_per_tech": {},
-                        "times": []
-                    }
+                site_down = down_info.get(site_code)
+                if site_down is None:
+                    site_down = down_info[site_code] = SiteDownState()
 
                 cat = alarm_category_dict.get(alarm_text)
 
                 if cat == "O&M":
-                    down_info[site_code]["techs"].add(tech)
-                    down_info[site_code]["om_only"].add(tech)
+                    site_down.techs[tech] = None
+                    site_down.om_only[tech] = None
                     # Removing from cells_only if it was there to keep techs clean for display
-                    down_info[site_code]["cells_only"].discard(tech)
+                    site_down.cells_only.pop(tech, None)
                 else:
                     # Only add to cells_only if not already down via O&M
                     # But we'll handle the 'Total Down' rule in summary.py logic
-                    if tech not in down_info[site_code]["om_only"]:
-                        down_info[site_code]["cells_only"].add(tech)
+                    if tech not in site_down.om_only:
+                        site_down.cells_only[tech] = None
                     else:
                         # Even if it's O&M down, we note that it has cells down for Micro logic
-                        down_info[site_code]["partial_only"].add(tech) # Using partial_only as a flag for O&M + Cells
-
-                # ===== Build descriptions per tech مع HW rename =====
-                desc_dict = build_down_description_per_tech(row, cat, tech)
-                for t, descs in desc_dict.items():
-                    down_info[site_code]["descriptions_per_tech"].setdefault(t, [])
-                    for d in descs:
-                        if d not in down_info[site_code]["descriptions_per_tech"][t]:
-                            down_info[site_code]["descriptions_per_tech"][t].append(d)
-
-                # ===== Build old style descriptions =====
-                for descs in desc_dict.values():
-                    for d in descs:
-                        if d not in down_info[site_code]["descriptions"]:
-                            down_info[site_code]["descriptions"].append(d)
+                        site_down.partial_only[tech] = None # Using partial_only as a flag for O&M + Cells
+
+                # ===== Faulty cells counts & HW alarms مع HW rename =====
+                cells_map, hw_items = parse_cells_and_hw(row, cat)
+                site_down.add_cell_counts(cells_map)
+                site_down.hw_alarms.update(hw_items)
 
                 # ===== Alarm Times =====
                 alarm_time = row.get("Alarm Time")
                 if pd.notna(alarm_time):
-                    down_info[site_code]["times"].append(alarm_time)
+                    site_down.times.append(alarm_time)
 
         except Exception as e:
             print(f"⚠️ Skipped {sheet}: {e}")
 
-    # Merge techs and cells_only
-    for site_code, info in down_info.items():
-        final_techs = list(info["techs"]) + [f"{t} Cells" for t in info["cells_only"]]
-        down_info[site_code]["techs"] = final_techs
-        down_info[site_code]["cells_only"] = list(info["cells_only"])
-
     return down_info
@@ -1,14 +1,16 @@
 import services.loaders as loaders
 from services.down_logic import build_down_dict
 from services.env_logic import build_env_dict
+from services.dashboard import TECH_LABELS, count_site, query_dashboard
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 import os
+import tempfile
 import html
 import re
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 
-def build_summary(filepath, selected_oz=None, user_comments=None, start_date=None, end_date=None):
+def build_summary(filepath, selected_oz=None, user_comments=None, start_date=None, end_date=None, excel_path=None):
     # Fix Timezone for Deployed Version (Cairo Time UTC+2)
     cairo_now = datetime.now(timezone(timedelta(hours=2))).replace(tzinfo=None)
     
@@ -28,6 +30,7 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
 
     rows = []
     critical_env_list = []
+    dashboard_buckets = {}
 
     for site_code in loaders.valid_sites:
         master = loaders.site_master_dict.get(site_code, {})
@@ -67,14 +70,18 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
             "_Original Site Name": str(master.get("Site Name", site_code))
         }
 
+        techs_down = []
+        env_count = 0
+        critical_alarms = []
+
         if site_code in down_info:
             site_down = down_info[site_code]
-            techs_down = site_down.get("techs", [])
-            om_only = set(site_down.get("om_only", []))
+            techs_down = site_down.down_techs()
+            om_only = site_down.om_only
             row["Down Alarm"] = ", ".join(sorted(techs_down))
 
-            if site_down.get("times"):
-                down_times = pd.to_datetime(site_down["times"], errors="coerce").dropna()
+            if site_down.times:
+                down_times = pd.to_datetime(site_down.times, errors="coerce").dropna()
                 if len(down_times) > 0:
                     row["Alarm Time"] = down_times.min().strftime("%Y-%m-%d %H:%M:%S")
                     row["_down_time"] = down_times.min()
@@ -90,7 +97,7 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
             partial_count = len([t for t in techs_down if t not in om_only])
 
             if site_type == "MICRO":
-                has_om_and_cells = len(om_only) >= 1 and (len(site_down.get("cells_only", [])) >= 1 or len(site_down.get("partial_only", [])) >= 1)
+                has_om_and_cells = len(om_only) >= 1 and (len(site_down.cells_only) >= 1 or len(site_down.partial_only) >= 1)
                 if om_count + partial_count >= 2 or has_om_and_cells: row["Down Type"] = "Total"
                 elif om_count + partial_count == 1: row["Down Type"] = "Partial"
             elif site_type in ["PICO","NANO"]:
@@ -103,14 +110,8 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
             if row["Down Type"] == "Total": row["Down Alarm Description"] = "Total Down"
             elif row["Down Type"] == "Partial":
                 lines = []
-                all_hw = set()
-                tech_counts = {}
-                for tech, tech_descs in site_down.get("descriptions_per_tech", {}).items():
-                    for desc in tech_descs:
-                        if desc.startswith("CELLS_COUNT:"): tech_counts[tech] = desc.split(":")[1]
-                        elif desc.startswith("HW Alarm:"): all_hw.add(desc)
-                for tech, count in tech_counts.items(): lines.append(f"{tech}: {count}")
-                for hw in sorted(list(all_hw)): lines.append(escape_but_allow_br(hw))
+                for tech, count in site_down.cell_counts.items(): lines.append(f"{tech}: {count}")
+                for hw in sorted(site_down.hw_alarms): lines.append(escape_but_allow_br(hw))
                 row["Down Alarm Description"] = "<br>".join(lines)
 
         badges = []
@@ -131,6 +132,7 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
             site_env = env_info[site_code]
             env_alarms_raw = site_env.get("alarms", [])
             row["ENV Alarms"] = " | ".join([escape_but_allow_br(a) for a in env_alarms_raw])
+            env_count = len(env_alarms_raw)
             env_times = pd.to_datetime(site_env.get("times", []), errors="coerce").dropna()
             env_duration_str = ""; env_is_long = False
             if len(env_times) > 0:
@@ -145,7 +147,6 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
                 if not row["Duration"]: row["Duration"] = env_duration_str; row["_long_duration"] = env_is_long
 
             # Detect Critical ENV Alarms
-            critical_alarms = []
             for alarm in env_alarms_raw:
                 if alarm.upper().strip() in loaders.critical_env_alarms and temp_site_type not in ["MICRO", "PICO", "NANO"]:
                     critical_alarms.append(alarm)
@@ -163,6 +164,7 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
                     "_env_time": row["_env_time"]
                 })
 
+        count_site(dashboard_buckets, row, techs_down, env_count, len(critical_alarms))
         rows.append(row)
 
     df = pd.DataFrame(rows)
@@ -171,12 +173,8 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
     else:
         df = df[(df["Down Alarm"] != "") | (df["ENV Alarms"] != "")].reset_index(drop=True)
 
-    # Dashboard Stats
-    dashboard = {}; dashboard_summary = {}
-    if not df.empty and "SC Office" in df.columns:
-        for office, group in df.groupby("SC Office"):
-            dashboard[office] = {"Total Down": (group["Down Type"]=="Total").sum(), "Partial Down": (group["Down Type"]=="Partial").sum(), "ENV": group["ENV Alarms"].apply(lambda x: len(str(x).split(" | ")) if x else 0).sum()}
-        dashboard_summary = {"Total Down Sites": (df["Down Type"]=="Total").sum(), "Total Partial Sites": (df["Down Type"]=="Partial").sum(), "Total Env Alarms": df["ENV Alarms"].apply(lambda x: len(str(x).split(" | ")) if x else 0).sum()}
+    # Dashboard Stats (accumulated per office/day while assembling rows)
+    dashboard, dashboard_summary = query_dashboard(dashboard_buckets)
 
     # Web Data
     tables_down_env_web = df[df["Down Alarm"]!=""].sort_values(by="_down_time", ascending=True).to_dict("records")
@@ -192,7 +190,8 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
         critical_env_table_web.append(c) # Real mapping happens in result.html loops generally
 
     # ----- EXCEL MULTI-SHEET EXPORT -----
-    excel_path = os.path.join("uploads", "Summary.xlsx")
+    if excel_path is None:
+        excel_path = os.path.join("uploads", "Summary.xlsx")
     
     def prepare_df_for_excel(df_to_prep, time_field_name, internal_time_col):
         if df_to_prep.empty: return df_to_prep
@@ -279,15 +278,24 @@ def build_summary(filepath, selected_oz=None, user_comments=None, start_date=Non
                     max_l = max(max_l, max(len(l) for l in lns))
             worksheet.column_dimensions[col[0].column_letter].width = min(max_l + 4, 60)
 
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        if not df_down_final.empty:
-            df_down_final.to_excel(writer, index=False, sheet_name='Down Alarms')
-            apply_style(writer.sheets['Down Alarms'])
-        if not df_env_final.empty:
-            df_env_final.to_excel(writer, index=False, sheet_name='ENV Alarms')
-            apply_style(writer.sheets['ENV Alarms'])
-        if not df_critical_final.empty:
-            df_critical_final.to_excel(writer, index=False, sheet_name='Critical ENV')
-            apply_style(writer.sheets['Critical ENV'])
-
-    return df, dashboard, dashboard_summary, tables_down_env_web, critical_env_list, tables_env_only_web, ['2G','3G','4G','5G'], [0,0,0,0], down_type_counts, [], [], excel_path
\ No newline at end of file
+    # Write to a temp file and swap it in, so a download never sees a half-written workbook
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(excel_path) or ".")
+    os.close(fd)
+    try:
+        with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+            if not df_down_final.empty:
+                df_down_final.to_excel(writer, index=False, sheet_name='Down Alarms')
+                apply_style(writer.sheets['Down Alarms'])
+            if not df_env_final.empty:
+                df_env_final.to_excel(writer, index=False, sheet_name='ENV Alarms')
+                apply_style(writer.sheets['ENV Alarms'])
+            if not df_critical_final.empty:
+                df_critical_final.to_excel(writer, index=False, sheet_name='Critical ENV')
+                apply_style(writer.sheets['Critical ENV'])
+        os.replace(tmp_path, excel_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    tech_counts = [dashboard_summary["Techs Down"][t] for t in TECH_LABELS]
+    return df, dashboard, dashboard_summary, tables_down_env_web, critical_env_list, tables_env_only_web, TECH_LABELS, tech_counts, down_type_counts, [], [], excel_path, dashboard_buckets
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""Benchmark build_down_dict against the previous dict-of-lists site state.
+
+Run from the repo root:  python tests/bench_down_logic.py [sites] [alarms_per_site]
+
+The sheet reader is replaced by a light row iterator so the numbers reflect
+the per-site bookkeeping, not pandas.read_excel / iterrows.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import services.down_logic as down_logic
+from services.loaders import clean_text, extract_site_code
+
+CELLS = "CELL FAULTY"
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+        self.empty = not rows
+
+    def iterrows(self):
+        return enumerate(self.rows)
+
+
+# ===== Previous implementation (dict of sets/lists per site) =====
+def legacy_build_down_description_per_tech(row, alarm_category, current_tech):
+    desc_per_tech = {}
+    if alarm_category == "O&M":
+        return desc_per_tech
+    user_info = str(row.get("User Additional Information", "")).strip()
+    diag_info = str(row.get("Diagnostic Info", "")).strip()
+    supp_info = str(row.get("Supplementary Information", "")).strip()
+    cells_map = {}
+    if "faulty_cells=" in user_info.lower():
+        try:
+            data = user_info.lower().split("faulty_cells=")[1].split(";")
+            for item in data:
+                if ":" in item:
+                    tech_name, cells = item.split(":")
+                    tech_name = tech_name.strip().upper()
+                    count = len([c for c in cells.split(",") if c.strip()])
+                    cells_map[tech_name] = cells_map.get(tech_name, 0) + count
+        except:
+            pass
+    for tech, count in cells_map.items():
+        desc_per_tech.setdefault(tech, []).append(f"CELLS_COUNT:{count}")
+    hw_items = set()
+    alarm_name_from_dict = down_logic.hw_rename_dict.get(supp_info.upper(), supp_info)
+    hw_units = []
+    if "unitname=" in diag_info.lower():
+        for part in diag_info.lower().split("unitname=")[1:]:
+            unit = part.split(";")[0].split(" ")[0].upper().strip()
+            if unit:
+                hw_units.append(unit)
+    if not hw_units and supp_info:
+        hw_units.append(supp_info)
+    for unit in hw_units:
+        hw_items.add(f"HW Alarm: {alarm_name_from_dict} ({unit})")
+    target_techs = list(cells_map.keys()) or [current_tech]
+    for tech in target_techs:
+        for hw in hw_items:
+            desc_per_tech.setdefault(tech, []).append(hw)
+    return desc_per_tech
+
+
+def legacy_build_down_dict(filepath):
+    down_info = {}
+    for sheet, tech in down_logic.TECH_MAP.items():
+        df = down_logic.pd.read_excel(filepath, sheet_name=sheet, engine="openpyxl")
+        for _, row in df.iterrows():
+            alarm_text = clean_text(row.get("Alarm Text", ""))
+            if not alarm_text or alarm_text not in down_logic.down_alarm_names:
+                continue
+            site_code = extract_site_code(row)
+            if not site_code or site_code not in down_logic.valid_sites:
+                continue
+            if site_code not in down_info:
+                down_info[site_code] = {"techs": set(), "cells_only": set(), "om_only": set(), "partial_only": set(),
+                                        "descriptions": [], "descriptions_per_tech": {}, "times": []}
+            site = down_info[site_code]
+            cat = down_logic.alarm_category_dict.get(alarm_text)
+            if cat == "O&M":
+                site["techs"].add(tech); site["om_only"].add(tech); site["cells_only"].discard(tech)
+            elif tech not in site["om_only"]:
+                site["cells_only"].add(tech)
+            else:
+                site["partial_only"].add(tech)
+            desc_dict = legacy_build_down_description_per_tech(row, cat, tech)
+            for t, descs in desc_dict.items():
+                site["descriptions_per_tech"].setdefault(t, [])
+                for d in descs:
+                    if d not in site["descriptions_per_tech"][t]:
+                        site["descriptions_per_tech"][t].append(d)
+            for descs in desc_dict.values():
+                for d in descs:
+                    if d not in site["descriptions"]:
+                        site["descriptions"].append(d)
+            alarm_time = row.get("Alarm Time")
+            if pd.notna(alarm_time):
+                site["times"].append(alarm_time)
+    for site_code, info in down_info.items():
+        info["techs"] = list(info["techs"]) + [f"{t} Cells" for t in info["cells_only"]]
+        info["cells_only"] = list(info["cells_only"])
+    return down_info
+
+
+def make_sheets(sites, alarms_per_site):
+    sheets = {}
+    for sheet in down_logic.TECH_MAP:
+        rows = []
+        for i in range(sites):
+            for j in range(alarms_per_site):
+                rows.append({
+                    "Alarm Text": CELLS,
+                    "Site Name": f"{i:04d}AL",
+                    "User Additional Information": f"faulty_cells=LTE:{j % 40},{j % 7};GSM:{j % 5}",
+                    "Diagnostic Info": f"unitname=FRG{j} ;unitname=FXD{j % 13}",
+                    "Supplementary Information": f"RF MODULE FAULT {j % 9}",
+                    "Alarm Time": j,
+                })
+        sheets[sheet] = rows
+    return sheets
+
+
+def measure(build):
+    start = time.perf_counter()
+    build("bench.xlsx")
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build("bench.xlsx")
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, retained, len(result)
+
+
+def main(sites=200, alarms_per_site=300):
+    sheets = make_sheets(sites, alarms_per_site)
+    down_logic.pd.read_excel = lambda filepath, sheet_name, engine: _Rows(sheets[sheet_name])
+    down_logic.valid_sites = {f"{i:04d}AL" for i in range(sites)}
+    down_logic.down_alarm_names = {CELLS}
+    down_logic.alarm_category_dict = {CELLS: "Cells"}
+    down_logic.hw_rename_dict = {}
+
+    print(f"{len(down_logic.TECH_MAP)} sheets x {sites} sites x {alarms_per_site} alarms")
+    for name, build in [("dict of lists", legacy_build_down_dict), ("SiteDownState", down_logic.build_down_dict)]:
+        elapsed, retained, n = measure(build)
+        print(f"{name:>14}: {elapsed:6.2f}s  retained {retained / 1e6:6.1f} MB  ({n} sites)")
+
+    # Both versions must show the same faulty cells count per tech
+    legacy, new = legacy_build_down_dict("bench.xlsx"), down_logic.build_down_dict("bench.xlsx")
+    for site_code, info in legacy.items():
+        shown = {}
+        for tech, descs in info["descriptions_per_tech"].items():
+            for desc in descs:
+                if desc.startswith("CELLS_COUNT:"):
+                    shown[tech] = int(desc.split(":")[1])
+        assert shown == new[site_code].cell_counts, site_code
+    print("cell counts match")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
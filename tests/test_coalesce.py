@@ -0,0 +1,145 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from services.coalesce import run_once
+
+N = 8
+
+
+def fake_summary(excel_path):
+    return (None, {}, {}, [], [], [], ["2G", "3G", "4G", "5G"], [0, 0, 0, 0],
+            {"Total": 0, "Partial": 0}, [], [], excel_path, {})
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app_module, "JOBS_FOLDER", str(tmp_path / "jobs"))
+    return tmp_path
+
+
+def post_concurrently(n, data=b"same NSN Update content", oz="OZ1"):
+    barrier = threading.Barrier(n)
+    responses = [None] * n
+
+    def worker(i):
+        client = app_module.app.test_client()
+        barrier.wait()
+        responses[i] = client.post("/process", data={
+            "oz": oz,
+            "NSN Update": (io.BytesIO(data), "NSN Update.xlsx"),
+        })
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return responses
+
+
+def test_identical_uploads_parse_once(uploads, monkeypatch):
+    calls = []
+
+    def counting_build_summary(path, selected_oz, excel_path=None, **kwargs):
+        calls.append(path)
+        time.sleep(0.5)  # keep the leader in flight while the others arrive
+        return fake_summary(excel_path)
+
+    monkeypatch.setattr(app_module, "build_summary", counting_build_summary)
+
+    responses = post_concurrently(N)
+
+    assert len(calls) == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.data for r in responses}) == 1
+
+
+@pytest.mark.parametrize("error, status", [
+    (app_module.UploadError("broken upload"), 400),
+    (ValueError("internal pandas error"), 500),
+])
+def test_failing_leader_error_reaches_every_waiter(uploads, monkeypatch, error, status):
+    calls = []
+
+    def failing_build_summary(path, selected_oz, excel_path=None, **kwargs):
+        calls.append(path)
+        time.sleep(0.5)
+        raise error
+
+    monkeypatch.setattr(app_module, "build_summary", failing_build_summary)
+
+    responses = post_concurrently(N)
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [status] * N
+    if status == 400:
+        assert all(r.data == b"broken upload" for r in responses)
+
+
+def test_waiters_get_their_own_exception_copy():
+    barrier = threading.Barrier(N)
+    calls = []
+    errors = [None] * N
+
+    def boom():
+        calls.append(1)
+        time.sleep(0.3)
+        raise ValueError("bad")
+
+    def worker(i):
+        barrier.wait()
+        try:
+            run_once("boom", boom)
+        except ValueError as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(N)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(str(e) == "bad" for e in errors)
+    leader = [e for e in errors if e.__cause__ is None]
+    assert len(leader) == 1
+    assert len({id(e) for e in errors}) == N
+    assert all(e.__cause__ is leader[0] for e in errors if e is not leader[0])
+
+
+def test_prune_skips_running_jobs_and_keeps_reused_ones(uploads, monkeypatch):
+    jobs = uploads / "jobs"
+    for age, name in enumerate(["new", "reused", "running", "stale"]):
+        (jobs / name).mkdir(parents=True)
+        os.utime(jobs / name, (1000 - age, 1000 - age))
+
+    monkeypatch.setattr(app_module, "JOBS_TO_KEEP", 1)
+    monkeypatch.setattr(app_module, "running_keys", lambda: {"running"})
+
+    # Starting a job on an existing folder marks it as the most recently used
+    app_module._use_job_dir("reused")
+    app_module._prune_jobs()
+
+    assert sorted(p.name for p in jobs.iterdir()) == ["reused", "running"]
+
+
+def test_prune_failure_does_not_fail_the_build(uploads, monkeypatch):
+    def broken_prune():
+        raise FileNotFoundError("gone")
+
+    monkeypatch.setattr(app_module, "_prune_jobs", broken_prune)
+    monkeypatch.setattr(app_module, "build_summary",
+                        lambda path, selected_oz, excel_path=None, **kwargs: fake_summary(excel_path))
+
+    response = app_module.app.test_client().post("/process", data={
+        "oz": "OZ1",
+        "NSN Update": (io.BytesIO(b"content"), "NSN Update.xlsx"),
+    })
+
+    assert response.status_code == 200
@@ -0,0 +1,69 @@
+import io
+import re
+
+import app as app_module
+from services.dashboard import count_site, query_dashboard
+
+
+def site_row(office, down_type="", alarm_time="", env="", env_time=""):
+    return {
+        "SC Office": office,
+        "Down Alarm": "2G" if down_type else "",
+        "Alarm Time": alarm_time,
+        "Down Type": down_type,
+        "ENV Alarms": env,
+        "ENV Alarm Time": env_time,
+    }
+
+
+def test_query_dashboard_filters_by_office_and_day():
+    buckets = {}
+    count_site(buckets, site_row("A", "Total", "2026-10-01 10:00:00", "x | y"), ["2G", "3G Cells"], 2, 0)
+    count_site(buckets, site_row("B", env="x", env_time="2026-10-03 08:00:00"), [], 1, 1)
+    count_site(buckets, site_row("", "Partial", "2026-10-02 09:00:00"), ["4G Cells"], 0, 0)
+
+    dashboard, summary = query_dashboard(buckets)
+    # Sites without an office count in the totals only
+    assert list(dashboard) == ["A", "B"]
+    assert dashboard["A"]["Total Down"] == 1 and dashboard["A"]["ENV"] == 2
+    assert summary["Total Partial Sites"] == 1
+    assert summary["Total Env Alarms"] == 3
+    assert summary["Total Critical ENV"] == 1
+    assert summary["Techs Down"] == {"2G": 1, "3G": 1, "4G": 1, "5G": 0}
+
+    dashboard, summary = query_dashboard(buckets, offices=["B"], start_date="2026-10-02")
+    assert list(dashboard) == ["B"]
+    assert summary["Total Env Alarms"] == 1 and summary["Total Down Sites"] == 0
+
+
+def test_dashboard_stats_are_kept_per_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app_module, "JOBS_FOLDER", str(tmp_path / "jobs"))
+    monkeypatch.setattr(app_module, "_dashboard_cache", app_module.OrderedDict())
+
+    def fake_build_summary(path, selected_oz, excel_path=None, **kwargs):
+        buckets = {}
+        count_site(buckets, site_row(selected_oz, "Total", "2026-10-01 10:00:00"), ["2G"], 0, 0)
+        dashboard, summary = query_dashboard(buckets)
+        return (None, dashboard, summary, [], [], [], [], [], {}, [], [], excel_path, buckets)
+
+    monkeypatch.setattr(app_module, "build_summary", fake_build_summary)
+
+    # Two result tabs in the same session
+    client = app_module.app.test_client()
+    jobs = {}
+    for oz in ("OZ1", "OZ2"):
+        page = client.post("/process", data={"oz": oz, "NSN Update": (io.BytesIO(b"same"), "NSN Update.xlsx")})
+        jobs[oz] = re.search(r'dashboardJobId = "([0-9a-f]{64})"', page.get_data(as_text=True)).group(1)
+
+    for oz, job_id in jobs.items():
+        stats = client.get("/dashboard_stats", query_string={"job": job_id}).get_json()
+        assert list(stats["dashboard"]) == [oz]
+
+    # Evicted from memory: served from the job folder
+    app_module._dashboard_cache.clear()
+    stats = client.get("/dashboard_stats", query_string={"job": jobs["OZ1"], "office": "OZ1"}).get_json()
+    assert stats["dashboard_summary"]["Total Down Sites"] == 1
+
+    missing = client.get("/dashboard_stats", query_string={"job": "0" * 64})
+    assert missing.status_code == 404 and "error" in missing.get_json()
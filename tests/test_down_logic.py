@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+import services.down_logic as down_logic
+
+CELLS = "CELL FAULTY"
+OM = "NE O&M CONNECTION FAILURE"
+
+
+def alarm(text, site="1234AL", cells="", unit="", supp="", time=None):
+    return {
+        "Alarm Text": text,
+        "Site Name": site,
+        "User Additional Information": f"faulty_cells={cells}" if cells else "",
+        "Diagnostic Info": f"unitname={unit}" if unit else "",
+        "Supplementary Information": supp,
+        "Alarm Time": time,
+    }
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    sheets = {}
+    monkeypatch.setattr(down_logic, "valid_sites", {"1234AL"})
+    monkeypatch.setattr(down_logic, "down_alarm_names", {CELLS, OM})
+    monkeypatch.setattr(down_logic, "alarm_category_dict", {CELLS: "Cells", OM: "O&M"})
+    monkeypatch.setattr(down_logic, "hw_rename_dict", {"RF MODULE FAULT": "RF Module"})
+    monkeypatch.setattr(down_logic, "TECH_MAP", {"2G_Down": "2G", "4G_Down": "4G"})
+    monkeypatch.setattr(down_logic.pd, "read_excel",
+                        lambda filepath, sheet_name, engine: pd.DataFrame(sheets.get(sheet_name, [])))
+    return sheets
+
+
+def test_site_state_dedups_and_keeps_last_new_cell_count(sheets):
+    sheets["4G_Down"] = [
+        alarm(CELLS, cells="LTE:1,2,3", unit="FRGU", supp="RF MODULE FAULT", time="2026-10-01 10:00:00"),
+        alarm(CELLS, cells="LTE:1,2,3,4,5", unit="FRGU", supp="RF MODULE FAULT"),
+        alarm(CELLS, cells="LTE:1,2,3", unit="FXDA", supp="RF MODULE FAULT"),
+    ]
+    sheets["2G_Down"] = [alarm(OM, time="2026-10-01 09:00:00")]
+
+    site = down_logic.build_down_dict("NSN Update.xlsx")["1234AL"]
+
+    assert isinstance(site, down_logic.SiteDownState)
+    # 3, 5, 3: the repeated 3 is not new, so 5 stays (same as the old description lists)
+    assert site.cell_counts == {"LTE": 5}
+    assert list(site.hw_alarms) == ["HW Alarm: RF Module (FRGU)", "HW Alarm: RF Module (FXDA)"]
+    assert list(site.om_only) == ["2G"]
+    assert site.down_techs() == ["2G", "4G Cells"]
+    assert len(site.times) == 2
+
+
+def test_om_alarm_clears_cells_only(sheets):
+    sheets["2G_Down"] = [alarm(CELLS, cells="GSM:1"), alarm(OM), alarm(CELLS, cells="GSM:1,2")]
+
+    site = down_logic.build_down_dict("NSN Update.xlsx")["1234AL"]
+
+    assert site.down_techs() == ["2G"]
+    assert list(site.partial_only) == ["2G"]
+    assert site.cell_counts == {"GSM": 2}